@@ -1,5 +1,5 @@
 from collections import Counter
-from bs4 import BeautifulSoup
+from lxml import etree, html
 import re
 
 import asyncio
@@ -10,7 +10,7 @@ import time
 # dictionary for car brands and its models
 import car_models
 
-from database_operations import check_if_car, fetch_data_into_database
+from database_operations import MIN_CAR_PRICE, is_car_heading, fetch_data_into_database, close_pool
 
 
 # SECTION FOR STOPWORDS
@@ -25,6 +25,10 @@ with open('stopwords-cs.txt', 'r', encoding='utf-8') as file:
 
 CAR_URL = 'https://auto.bazos.cz/'
 
+# Requests open to bazos at once. Every request goes to the same host, so this is also the per-host limit.
+# aiohttp's default of 100 only adds queueing on their side and makes 429s more likely
+MAX_CONCURRENT_REQUESTS = 20
+
 CAR_MODELS = car_models.CAR_MODELS
 
 CAR_BRANDS = ['alfa', 'audi', 'bmw', 'citroen', 'dacia', 'fiat', 
@@ -49,95 +53,112 @@ def get_frequency_analysis(string_list: list):
 
 # ANALYSING STRINGS FNCS
 # Getting data from string with regex
+# Punctuation is skipped inside the patterns instead of being stripped from the text first,
+# so "184.000km" or "185 tis. km" match without building a cleaned-up copy of every description.
+# Unlike stripping, a decimal comma or dot is still seen: '1.6kW' is not read as 16 kW or 6 kW
+PUNCT = r'[^\w\s]*'
+# optional space with punctuation around it; without a space there is only one punctuation run,
+# two runs side by side could split '7-----' in many ways and backtrack on long runs of punctuation
+GAP = PUNCT + r'(?:\s' + PUNCT + r')?'
+# a number never starts right after '1.' or '1,', that is the fraction of a decimal number
+NUMBER_START = r'(?<!\d[.,])'
+
+# number with optional thousands separators, captured under the given group name
+def mileage_number(name):
+    return NUMBER_START + r'(?P<' + name + r'>\d{1,3}(?:' + GAP + r'\d{3})*)'
+
+# one pass over the text for all three ways of writing mileage, the first one in the text wins
+MILEAGE_PATTERN = re.compile(
+    mileage_number('km') + GAP + 'km'                          # '150 000 km'
+    + '|' + mileage_number('tis') + r'(?:[.,](?P<tis_fraction>\d{1,2}))?'  # '99,5 tis km' is 99 500 km
+    + GAP + 'tis' + GAP + 'km'                                 # '150 tis. km', 'tis' representing thousands
+    + '|' + mileage_number('xxx') + GAP + 'xxx' + GAP + 'km',  # '150 xxx km'
+    re.IGNORECASE)
+POWER_PATTERN = re.compile(NUMBER_START + r'(\d{1,3})' + GAP + 'kw', re.IGNORECASE)
+NON_DIGIT = re.compile(r'\D')
+
 def get_mileage(long_string: str):
-    text = re.sub(r'[^\w\s]', '', long_string.lower())
-    words_uned = text.split()
-    # Define regular expression pattern for mileage
-    pattern = r'(\d{1,3}(?:\s?\d{3})*(?:\.\d+)?)\s?km'  # Matches numbers with optional thousands separators followed by optional ' km'
-    pattern2 = r'(\d{1,3}(?:\s?\d{3})*)(?:\.|\s?tis\.?)\s?km'   # Matches mileage value with 'tis' representing thousands followed by 'km'
-    pattern3 = r'(\d{1,3}(?:\s?\d{3})*)(?:\s?xxx\s?km)'
-
-    # Find all matches of the pattern in the text
-    matches1 = re.findall(pattern, text)
-    matches2 = re.findall(pattern2, text)
-    matches3 = re.findall(pattern3, text)
-
-    # Extract mileage from the matches
-    mileage = None
-    if matches1:  # Check pattern 1 matches first
-        try:
-            mileage = int(matches1[0].replace(' ', ''))  # Remove spaces and dots from the matched value
-        except ValueError:
-                pass
-    elif matches2:  # If pattern 1 doesn't match, check pattern 2 matches
-        try:
-            mileage = int(matches2[0].replace(' ', '')) * 1000  # Convert 'tis' to thousands
-        except ValueError:
-                pass
-    elif matches3:
-        try:
-            mileage = int(matches3[0].replace(' ', '')) * 1000
-        except ValueError:
-                pass
-    return mileage
+    match = MILEAGE_PATTERN.search(long_string)
+    if match is None:
+        return None
+    if match['km']:
+        return int(NON_DIGIT.sub('', match['km']))  # Remove spaces and dots from the matched value
+    if match['tis']:
+        fraction = match['tis_fraction'] or ''
+        return int(NON_DIGIT.sub('', match['tis'])) * 1000 + int(fraction.ljust(3, '0'))  # Convert 'tis' to thousands
+    return int(NON_DIGIT.sub('', match['xxx'])) * 1000
 
 def get_power(long_string: str):
-    text = re.sub(r'[^\w\s]', '', long_string.lower())
-    pattern_kW = re.compile(r'(\d{1,3})\s?kw', re.IGNORECASE)
-    match = pattern_kW.search(text)
+    match = POWER_PATTERN.search(long_string)
     if match:
-        return int(re.sub(r'\D', '', match.group(1)))  # Remove non-digit characters
+        return int(match.group(1))
     return None
 
+# first four-digit number; a prefix like 'rok výroby' or 'r.v.' was only ever optional,
+# so it never changed which number matched and just made every position try five alternatives
+YEAR_PATTERN = re.compile(r'(\d{4})\b')
+
 def get_year_manufacture(long_string: str) -> int:
-    pattern = re.compile(r'(?:rok výroby|R\.?V\.?|rok|r\.?v\.?|výroba)?\s*(\d{4})\b', re.IGNORECASE)
-    match = pattern.search(long_string)
+    match = YEAR_PATTERN.search(long_string)
     if match:
         return int(match.group(1))
     return None
 
+# one compiled pattern per brand, built once instead of on every offer
+MODEL_PATTERNS = {brand: re.compile(r'\b(?:' + '|'.join(models) + r')\b', re.IGNORECASE)
+                  for brand, models in CAR_MODELS.items()}
+
 def get_model(brand, header: str) -> str:
-    models = CAR_MODELS.get(brand)
-    if models is not None:
-        pattern = re.compile(r'\b(?:' + '|'.join(models) + r')\b', re.IGNORECASE)
+    pattern = MODEL_PATTERNS.get(brand)
+    if pattern is not None:
         match = pattern.search(header)
         if match:
             return match.group(0)
     return None
 
+# XPATHS FOR SCRAPED PAGES
+# Compiled once and evaluated by libxml2, instead of walking a BeautifulSoup tree in Python
+def has_class(name):
+    # same as BeautifulSoup class_=name, the class attribute contains the word name
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# smart_strings=False so results are plain str and don't keep the whole page tree alive
+BRAND_LINKS_XPATH = etree.XPath(f"(//*[{has_class('barvaleva')}])[1]//a", smart_strings=False)
+OFFERS_COUNT_XPATH = etree.XPath(f"string((//div[{has_class('inzeratynadpis')}])[1])", smart_strings=False)
+DETAIL_LINKS_XPATH = etree.XPath("//div[@class='inzeraty inzeratyflex']/descendant::a[1]/@href", smart_strings=False)
+HEADING_XPATH = etree.XPath(f"string((//*[{has_class('nadpisdetail')}])[1])", smart_strings=False)
+PRICE_XPATH = etree.XPath(f"string((//table)[1]/descendant::td[{has_class('listadvlevo')}][1]/descendant::table[1]/descendant::tr[last()])", smart_strings=False)
+DESCRIPTION_XPATH = etree.XPath(f"string((//div[{has_class('popisdetail')}])[1])", smart_strings=False)
+
 # ASYNCHRONOUS WEB SCRAPPING
 # Cascade of web srappping to get detail info about car offer 
 
-async def fetch_data(url):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            return await response.text()
+# session is shared by the whole run, so connections to bazos are kept alive between requests
+async def fetch_data(session, url):
+    async with session.get(url) as response:
+        return await response.text()
 # getting urls for brands
-async def get_brand_urls():
+async def get_brand_urls(session):
     # Fetch car brands URLs asynchronously
     brand_url_list = []
-    data = await fetch_data(CAR_URL)
-    soup = BeautifulSoup(data, 'html.parser')
-    menubar = soup.find(class_="barvaleva")
-    if menubar:
-        a_tags = menubar.find_all('a')
-        for tag in a_tags[:24]:
-            car_href = tag.get('href')
-            brand = car_href[1:-1]
-            brand_url_list.append((brand,f'https://auto.bazos.cz{car_href}'))
+    data = await fetch_data(session, CAR_URL)
+    a_tags = BRAND_LINKS_XPATH(html.fromstring(data))
+    for tag in a_tags[:24]:
+        car_href = tag.get('href')
+        brand = car_href[1:-1]
+        brand_url_list.append((brand,f'https://auto.bazos.cz{car_href}'))
     return brand_url_list
 
 # [(bran, brand_url)]
 
 # for each brand getting urls for all their pages
-async def get_all_pages_for_brands(brand_url_list):
+async def get_all_pages_for_brands(session, brand_url_list):
     # Fetch all pages for each brand asynchronously
     allpages_for_brand_list = []
     for brand_url in brand_url_list:
         brand, base_url = brand_url
-        data = await fetch_data(base_url)
-        soup = BeautifulSoup(data, 'html.parser')
-        num_of_objs_text = soup.find('div', class_='inzeratynadpis').text.split('z ')[1].strip()
+        data = await fetch_data(session, base_url)
+        num_of_objs_text = OFFERS_COUNT_XPATH(html.fromstring(data)).split('z ')[1].strip()
         num_of_objs = int(num_of_objs_text.replace(' ', ''))
         pages = [f"{base_url}{x}/" for x in range(20, num_of_objs, 20)]
         allpages_for_brand_list.append((brand, pages))
@@ -146,42 +167,47 @@ async def get_all_pages_for_brands(brand_url_list):
 # [(brand, [all brand url pages])]
 
 # going through brand pages and getting urls for car offers detail
-async def get_urls_for_details(brand_pages):
+async def get_urls_for_details(session, brand_pages):
     async def fetch_and_process(url):
-        data = await fetch_data(url)
-        soup = BeautifulSoup(data, 'html.parser')
-        headings = soup.find_all('div', class_='inzeraty inzeratyflex')
-        urls_detail_list = []
-        if headings:
-            for head in headings:
-                relative_url = head.find('a').get('href')
-                absolute_url = f"https://auto.bazos.cz{relative_url}"
-                urls_detail_list.append(absolute_url)
-        return urls_detail_list
+        data = await fetch_data(session, url)
+        relative_urls = DETAIL_LINKS_XPATH(html.fromstring(data))
+        return [f"https://auto.bazos.cz{relative_url}" for relative_url in relative_urls]
 
+    page_brands = [brand for brand, pages in brand_pages for url in pages]
     tasks = [fetch_and_process(url) for brand, pages in brand_pages for url in pages]
     results = await asyncio.gather(*tasks)
-    
-    final_list = [(brand, url) for brand, pages in brand_pages for urls in results for url in urls]
+
+    # same offer often shows up on two pages when new offers are added during scraping
+    seen = set()
+    final_list = []
+    for brand, urls in zip(page_brands, results):
+        for url in urls:
+            if url in seen:
+                continue
+            seen.add(url)
+            final_list.append((brand, url))
     return final_list
 
 # [(brand, [all detail urls])]
 
 # scrapping description, heading
-async def get_descriptions_headings_price(brand_urls):
+async def get_descriptions_headings_price(session, brand_urls):
     async def fetch_and_process(url):
-        data = await fetch_data(url)
-        soup = BeautifulSoup(data, 'html.parser')
-        description = soup.find('div', class_='popisdetail').text.strip()
-        heading = soup.find(class_="nadpisdetail").text.strip()
-        price_nc= soup.find('table').find('td', class_='listadvlevo').find('table').find_all('tr')[-1].text
-        price_digits = ''.join(re.findall(r'\d+', price_nc))
-        price = int(price_digits) if price_digits else None
+        data = await fetch_data(session, url)
+        page = html.fromstring(data)
+        heading = HEADING_XPATH(page).strip()
+        # wheels, parts... are recognised by heading alone, skip the rest of the page for them
+        if not is_car_heading(heading):
+            return None
 
-        is_car = check_if_car(description, heading, price=price)
-        
-        if not is_car:
+        price_nc = PRICE_XPATH(page)
+        # isdecimal is what \d matches, keeps only the digits of '125 000 Kč'
+        price_digits = ''.join(filter(str.isdecimal, price_nc))
+        price = int(price_digits) if price_digits else None
+        if price is None or price < MIN_CAR_PRICE:
             return None
+
+        description = DESCRIPTION_XPATH(page).strip()
         return (description, heading, price)
 
     tasks = [fetch_and_process(url) for brand, url in brand_urls]
@@ -191,8 +217,8 @@ async def get_descriptions_headings_price(brand_urls):
     return final_list
 
 # processing the string and retrieving the data
-async def process_data(brand, description, heading, price):
-    # Process data asynchronously
+def process_data(brand, description, heading, price):
+    # Pure CPU work with nothing to await, so it runs as a plain function
     # Perform string analysis, extract information like brand, model, mileage, power, year of manufacture, price
     # Return car JSON
     model = get_model(brand=brand, header=heading)
@@ -214,26 +240,31 @@ async def process_data(brand, description, heading, price):
 
 # all together 
 async def main():
-    # Step 1: Get car brands URLs
-    # brand_urls = await get_brand_urls()
-    
-    # Step 2: Get all pages for each brand
-    brand_pages = await get_all_pages_for_brands([('volvo', 'https://auto.bazos.cz/volvo/')])
-    
-    # Step 3: Get URLs for details on each page concurrently
-    urls_detail_list = await get_urls_for_details(brand_pages)
-    
-    # Step 4: Get descriptions, headings, and prices concurrently
-    descriptions_headings_price_list = await get_descriptions_headings_price(urls_detail_list)
+    # One session for all steps, instead of a new connection (and TLS handshake) for every page
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_REQUESTS, limit_per_host=MAX_CONCURRENT_REQUESTS)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # Step 1: Get car brands URLs
+        # brand_urls = await get_brand_urls(session)
+
+        # Step 2: Get all pages for each brand
+        brand_pages = await get_all_pages_for_brands(session, [('volvo', 'https://auto.bazos.cz/volvo/')])
+
+        # Step 3: Get URLs for details on each page concurrently
+        urls_detail_list = await get_urls_for_details(session, brand_pages)
+
+        # Step 4: Get descriptions, headings, and prices concurrently
+        descriptions_headings_price_list = await get_descriptions_headings_price(session, urls_detail_list)
     
-    # Step 5: Create tasks for processing data asynchronously
-    tasks = [process_data(brand, description, heading, price) for brand, description, heading, price in descriptions_headings_price_list]
-    processed_data = await asyncio.gather(*tasks)
+    # Step 5: Process data, no task per offer needed as there is no I/O left
+    processed_data = [process_data(brand, description, heading, price) for brand, description, heading, price in descriptions_headings_price_list]
     
     
 
     # Step 6: Save data into database 
-    await fetch_data_into_database(data=processed_data)
+    try:
+        await fetch_data_into_database(data=processed_data)
+    finally:
+        await close_pool()
 
 async def run():
     await main()
@@ -241,6 +272,13 @@ async def run():
 
 
 if __name__ == "__main__":
+    # uvloop is faster than the default event loop, but not available everywhere (Windows)
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     start_time= time.time()
     asyncio.run(run())
     end_time = time.time()
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy import Column, Integer, String, BigInteger
+from sqlalchemy import Column, Integer, String, BigInteger, Index
 from sqlalchemy import create_engine
 import os
 from dotenv import load_dotenv
@@ -17,6 +17,8 @@ class Base(DeclarativeBase):
 
 class Car(Base):
     __tablename__ = 'cars'
+    # every API query filters cars by brand and model
+    __table_args__ = (Index('ix_cars_brand_model', 'brand', 'model'),)
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     brand = Column(String(length=50))
@@ -1,14 +1,13 @@
 import re
 from bs4 import BeautifulSoup
 import requests
-from car_models import CAR_MODELS
 
-from data_scrap import preprocess_text
+from data_scrap import preprocess_text, get_mileage, get_power, get_year_manufacture, get_model
 
 
 def scrap_this_url(url):
     response = requests.get(url=url)
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = BeautifulSoup(response.text, 'lxml')
     return soup
 
 
@@ -87,69 +86,6 @@ def scrap_this_url(url):
 #         describtions.append(text)
 #     return describtions
 
-def get_mileage(long_string: str):
-    text = re.sub(r'[^\w\s]', '', long_string.lower())
-    words_uned = text.split()
-    # Define regular expression pattern for mileage
-    pattern = r'(\d{1,3}(?:\s?\d{3})*(?:\.\d+)?)\s?km'  # Matches numbers with optional thousands separators followed by optional ' km'
-    pattern2 = r'(\d{1,3}(?:\s?\d{3})*)(?:\.|\s?tis\.?)\s?km'  # Matches mileage value with 'tis' representing thousands followed by 'km'
-    pattern3 = r'(\d{1,3}(?:\s?\d{3})*)(?:\s?xxx\s?km)'
-
-    # Find all matches of the pattern in the text
-    matches1 = re.findall(pattern, text)
-    matches2 = re.findall(pattern2, text)
-    matches3 = re.findall(pattern3, text)
-
-    # Extract mileage from the matches
-    mileage = None
-    if matches1:  # Check pattern 1 matches first
-        mileage = int(matches1[0].replace(' ', ''))  # Remove spaces and dots from the matched value
-    elif matches2:  # If pattern 1 doesn't match, check pattern 2 matches
-        mileage = int(matches2[0].replace(' ', '')) * 1000  # Convert 'tis' to thousands
-    elif matches3:
-        mileage = int(matches3[0].replace(' ', '')) * 1000
-    return mileage
-
-def get_power(long_string: str):
-    text = re.sub(r'[^\w\s]', '', long_string.lower())
-    power = None
-
-    pattern_kW = r'(\d{1,3})\s?kw'
-
-    matches_kW = re.findall(pattern_kW, text, re.IGNORECASE)
-    if matches_kW:  # If kW pattern matches
-        power = int(matches_kW[0].replace(' ', '').replace('.', ''))  # Remove spaces and dots from the matched value
-
-    return power
-
-def get_year_manufacture(long_string: str) -> int: 
-    manufacture_year = None
-   
-    patterns = [
-        r'(?:rok výroby|R\.?V\.?|rok|r\.?v\.?):\s*(\d{4})\b',
-        r'(\d{4})\s*\(rok výroby\)',
-        r'výroba\s*(\d{4})',
-        r'\b(\d{4})\b',
-        r'rok výroby\s*(\d{4})',
-    ]
-
-    for pattern in patterns:
-        matches = re.findall(pattern, long_string, re.IGNORECASE)
-        if matches:
-            manufacture_year = int(matches[0])
-            break
-
-    return manufacture_year
-
-def get_model(brand ,header: str) -> str:
-    models = CAR_MODELS.get(brand)
-    if models is not None:
-        pattern = r'\b(?:' + '|'.join(models) + r')\b'
-        match = re.search(pattern, header, re.IGNORECASE)
-        if match:
-            return match.group(0)
-    return None
-
 def test(url):
     soup = scrap_this_url(url=url)
     description = soup.find('div', class_='popisdetail').text.strip()
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from data_scrap import get_mileage, get_power
+
+@pytest.mark.parametrize("long_string, expected_result", [
+    ("Aktuálně najeto 40 866 km.", 40866),
+    ("najeto: 155 000 km, palivo: benzín", 155000),
+    ("najeto 184.000km. STK do 9/2025", 184000),  # dot as thousands separator
+    ("najeto 239tis km. Vše funkční", 239000),
+    ("r.v. 2006, najeto 185 tis. km, fialová", 185000),
+    ("Najeto: 170 xxx km Palivo: Diesel", 170000),
+    ("najeto 99,5 tis km", 99500),  # decimal comma before 'tis'
+    ("NAJETO 95 000 KM", 95000),
+    ("najeto 185 tis. km, servis po 15 000 km", 185000),  # first mileage in the text wins
+    ("Prodám Mazdu 6 combi, 2.0 l, 108 kW", None),
+])
+
+
+def test_get_mileage(long_string, expected_result):
+    assert get_mileage(long_string) == expected_result
+
+
+@pytest.mark.parametrize("long_string, expected_result", [
+    ("Prodám BMW F31 320D Touring 2.0 140kW CR AUTOMAT", 140),
+    ("motorizací 1.2 PureTech (60 kW - 82 koní)", 60),
+    ("objem: 1339, výkon: 73KW Původ ČR", 73),
+    ("motor 1.6 HDi 66kW", 66),
+    ("výkon 1.6kW", None),  # fraction of a decimal number is not the power
+    ("najeto 185 tis. km", None),
+])
+
+
+def test_get_power(long_string, expected_result):
+    assert get_power(long_string) == expected_result
+
+
+# a digit followed by a long run of punctuation used to backtrack for seconds
+@pytest.mark.parametrize("long_string", [
+    "Tel. 777123456" + "-" * 5000,
+    "85" + "😀" * 3000,
+    "12" + "." * 3000 + "tis",  # 'tis' and 'xxx' branches of the one mileage pattern
+    "170" + "-" * 3000 + " xxx" + "-" * 3000,
+])
+
+
+def test_long_punctuation_run_is_fast(long_string):
+    start = time.perf_counter()
+    assert get_mileage(long_string) is None
+    assert get_power(long_string) is None
+    assert time.perf_counter() - start < 1
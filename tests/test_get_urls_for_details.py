@@ -0,0 +1,35 @@
+import pytest
+
+import data_scrap
+from data_scrap import get_urls_for_details
+
+# brand list pages, each one with links to offer details
+PAGES = {
+    'https://auto.bazos.cz/volvo/20/': ['/inzerat/1/volvo-v70.php', '/inzerat/2/volvo-xc60.php'],
+    'https://auto.bazos.cz/volvo/40/': ['/inzerat/2/volvo-xc60.php', '/inzerat/3/volvo-s60.php'],  # offer 2 moved to the next page
+    'https://auto.bazos.cz/mazda/20/': ['/inzerat/4/mazda-6.php'],
+}
+
+
+async def fake_fetch_data(session, url):
+    offers = ''.join(f'<div class="inzeraty inzeratyflex"><a href="{href}">offer</a></div>' for href in PAGES[url])
+    return f'<html><body>{offers}</body></html>'
+
+
+@pytest.mark.asyncio
+async def test_get_urls_for_details(monkeypatch):
+    monkeypatch.setattr(data_scrap, 'fetch_data', fake_fetch_data)
+    brand_pages = [
+        ('volvo', ['https://auto.bazos.cz/volvo/20/', 'https://auto.bazos.cz/volvo/40/']),
+        ('mazda', ['https://auto.bazos.cz/mazda/20/']),
+    ]
+
+    result = await get_urls_for_details(None, brand_pages)
+
+    # every offer once, paired with the brand of the page it was found on
+    assert result == [
+        ('volvo', 'https://auto.bazos.cz/inzerat/1/volvo-v70.php'),
+        ('volvo', 'https://auto.bazos.cz/inzerat/2/volvo-xc60.php'),
+        ('volvo', 'https://auto.bazos.cz/inzerat/3/volvo-s60.php'),
+        ('mazda', 'https://auto.bazos.cz/inzerat/4/mazda-6.php'),
+    ]